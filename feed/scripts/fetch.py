@@ -2,17 +2,40 @@
 # -*- coding: utf-8 -*-
 
 import json
+import os
 import time
+import types
 import hashlib
+import heapq
 import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
+from operator import itemgetter
 from pathlib import Path
+from sys import intern
 import xml.etree.ElementTree as ET
-from urllib.parse import urlparse
+from urllib.parse import parse_qsl, urlencode, urlparse, urlsplit, urlunsplit
 
 import requests
+from requests.adapters import HTTPAdapter
 import feedparser
 import yaml
 
+try:
+    from yaml import CSafeLoader as _YamlLoader  # libyaml, ~10x faster
+except ImportError:
+    from yaml import SafeLoader as _YamlLoader
+
+try:
+    import ahocorasick  # optional: single-pass keyword matching
+except ImportError:
+    ahocorasick = None
+
+try:
+    import orjson  # optional: much faster JSON encoding
+except ImportError:
+    orjson = None
+
 # ----- Paths (repo root → /feed subtree) -----
 ROOT = Path(__file__).resolve().parents[2]     # from feed/scripts/* -> repo root
 BASE = ROOT / "feed"
@@ -20,10 +43,18 @@ BASE = ROOT / "feed"
 OPML  = BASE / "config" / "sources.opml"
 RULES = BASE / "config" / "rules.yml"
 OUT   = BASE / "data"   / "items.json"
+CACHE = BASE / "data"   / "http_cache.json"
 OUT.parent.mkdir(parents=True, exist_ok=True)
 
 UA = "Rob-AntiFeed/1.0 (+https://g4dge.github.io/feed) Python-Requests"
 TIMEOUT = 20
+MAX_WORKERS = 16
+
+# One session shared by all workers so TCP/TLS connections get reused.
+SESSION = requests.Session()
+_adapter = HTTPAdapter(pool_connections=MAX_WORKERS, pool_maxsize=MAX_WORKERS)
+SESSION.mount("http://", _adapter)
+SESSION.mount("https://", _adapter)
 
 
 # ----------------- OPML -----------------
@@ -32,18 +63,46 @@ def parse_opml(path: Path):
     Collect feeds from OPML; tolerant to casing and nesting.
     On XML error, raise with context around the failing line.
     """
+    feeds = []
+    group_stack = []
     try:
-        text = path.read_text(encoding="utf-8")
-    except Exception as e:
+        # Stream outline elements instead of materialising the whole
+        # tree; memory stays O(depth) and folder names ride on a stack.
+        # The raw text is only read back if we need an error snippet.
+        for event, elem in ET.iterparse(str(path), events=("start", "end")):
+            tag = elem.tag.split("}", 1)[-1].lower()
+            if tag != "outline":
+                continue
+            if event == "start":
+                a = elem.attrib
+                xml_url = (a.get("xmlUrl") or a.get("xmlurl") or a.get("url")
+                           or a.get("htmlUrl") or a.get("htmlurl"))
+                name    = a.get("text") or a.get("title") or ""
+                if a and (xml_url is None or not name):
+                    # Rare: unusual attribute casing — fall back to a lowered copy
+                    low = {k.lower(): v for k, v in a.items()}
+                    xml_url = xml_url or low.get("xmlurl") or low.get("url") or low.get("htmlurl")
+                    name    = name or low.get("text") or low.get("title") or ""
+                if xml_url:
+                    feeds.append({"title": name, "url": xml_url,
+                                  "category": group_stack[-1] if group_stack else ""})
+                # If this outline is a folder, its name becomes the
+                # category for nested outlines
+                group_stack.append(name or (group_stack[-1] if group_stack else ""))
+            else:
+                group_stack.pop()
+                elem.clear()
+    except OSError as e:
         raise RuntimeError(f"Failed to read OPML at {path}: {e}")
-
-    try:
-        tree = ET.ElementTree(ET.fromstring(text))
     except ET.ParseError as pe:
         msg = str(pe)
         m = re.search(r"line (\d+), column (\d+)", msg)
         context = ""
         if m:
+            try:
+                text = path.read_text(encoding="utf-8")
+            except Exception:
+                text = ""
             ln = int(m.group(1))
             lines = text.splitlines()
             start = max(0, ln - 3)
@@ -60,27 +119,37 @@ def parse_opml(path: Path):
             f"{context}"
         )
 
-    feeds = []
-    root = tree.getroot()
-
-    def walk(node, group=None):
-        for child in list(node):
-            tag = child.tag.split("}", 1)[-1].lower()
-            if tag == "outline":
-                attrs = {k.lower(): v for k, v in child.attrib.items()}
-                xml_url = attrs.get("xmlurl") or attrs.get("url") or attrs.get("htmlurl")
-                text    = attrs.get("text") or attrs.get("title") or ""
-                if xml_url:
-                    feeds.append({"title": text, "url": xml_url, "category": group or ""})
-                # If this outline is a folder, pass its name as category to children
-                walk(child, group=text or group)
-            else:
-                walk(child, group)
-    walk(root, None)
     return feeds
 
 
 # ----------------- Rules -----------------
+# Below this many keywords a plain scan beats building an automaton.
+AC_MIN_KEYWORDS = 8
+
+
+def _build_automaton(needles_cf):
+    if ahocorasick is None or len(needles_cf) < AC_MIN_KEYWORDS:
+        return None
+    auto = ahocorasick.Automaton()
+    for n in needles_cf:
+        auto.add_word(n, n)
+    auto.make_automaton()
+    return auto
+
+
+def _compile_union(needles_cf):
+    """
+    One alternation pattern for a whole needle list: a single C-level
+    scan per item instead of a Python loop over needles. Needles are
+    escaped literals, so this keeps the existing substring semantics.
+    """
+    # For one or two needles, a bare `in` scan (C memmem) beats firing
+    # up the regex engine — leave those to matches_any's fallback loop.
+    if len(needles_cf) < 3:
+        return None
+    return re.compile("|".join(map(re.escape, needles_cf)))
+
+
 def load_rules(path: Path):
     """
     Load YAML rules with strong defaults and normalisation so
@@ -100,11 +169,14 @@ def load_rules(path: Path):
         "exclude_tags": [],
         "max_per_source": {},
         "pin": [],
+        "id_algo": "sha1",
+        "fetch_workers": MAX_WORKERS,
+        "sanitize_html": True,
     }
-    if not path.exists():
-        return defaults
-
-    data = yaml.safe_load(path.read_text(encoding="utf-8")) or {}
+    if path.exists():
+        data = yaml.load(path.read_bytes(), Loader=_YamlLoader) or {}
+    else:
+        data = {}
 
     def _as_list(x):
         if isinstance(x, list):
@@ -126,20 +198,124 @@ def load_rules(path: Path):
     out["max_per_source"]     = _as_dict(out.get("max_per_source"))
     out["pin"]                = _as_list(out.get("pin"))
 
-    for k, dflt in [("min_title_length", 0), ("max_items", 500), ("max_age_days", 36500)]:
+    v = out.get("sanitize_html")
+    out["sanitize_html"] = True if v is None else bool(v)
+
+    for k, dflt in [("min_title_length", 0), ("max_items", 500), ("max_age_days", 36500),
+                    ("fetch_workers", MAX_WORKERS)]:
         try:
             out[k] = int(out.get(k, dflt) or dflt)
         except Exception:
             out[k] = dflt
 
+    # Casefold every needle list once so per-item matching never re-lowers.
+    for k in ("include_keywords", "blocklist_keywords",
+              "include_sources", "exclude_sources",
+              "include_authors", "exclude_authors",
+              "include_tags", "exclude_tags"):
+        out["_" + k + "_cf"] = [str(s).casefold() for s in out[k] if s]
+
+    # Normalise per-source caps once: casefolded keys, int values
+    caps_cf = {}
+    for k, v in out["max_per_source"].items():
+        try:
+            caps_cf[str(k).casefold()] = int(v)
+        except Exception:
+            pass
+    out["_caps_cf"] = caps_cf
+
+    # Oldest acceptable timestamp, precomputed so the per-item age check
+    # is a string comparison
+    out["_cutoff_iso"] = _fmt_iso(time.gmtime(time.time() - out["max_age_days"] * 86400))
+
+    # Big keyword lists get an Aho-Corasick automaton: one pass over the
+    # text instead of a scan per needle (None when unavailable/small).
+    out["_include_ac"]   = _build_automaton(out["_include_keywords_cf"])
+    out["_blocklist_ac"] = _build_automaton(out["_blocklist_keywords_cf"])
+
+    # Fallback for lists below the automaton threshold: one compiled
+    # alternation instead of a per-needle Python loop.
+    out["_include_re"]   = _compile_union(out["_include_keywords_cf"])
+    out["_blocklist_re"] = _compile_union(out["_blocklist_keywords_cf"])
+
+    # Everything allowed_by_lists touches, as one tuple: a single dict
+    # lookup + unpack per item instead of a dict hit per rule.
+    out["_hot"] = (
+        out["min_title_length"], out["_cutoff_iso"],
+        out["_include_sources_cf"], out["_exclude_sources_cf"],
+        out["_include_authors_cf"], out["_exclude_authors_cf"],
+        out["_include_tags_cf"], out["_exclude_tags_cf"],
+        out["_include_keywords_cf"], out["_include_ac"], out["_include_re"],
+        out["_blocklist_keywords_cf"], out["_blocklist_ac"], out["_blocklist_re"],
+    )
+
     return out
 
 
 # ----------------- Helpers -----------------
+# Item-id hashing. sha1 is the historical default (existing items.json
+# ids depend on it); rules.yml can opt into blake2b (same 40-hex width)
+# or blake2b64 (8-byte digest, 16 hex chars — still vanishing collision
+# odds at feed scale) via `id_algo`. Ids are identifiers, not security
+# material, so the faster options are fine.
+_uid_algo = "sha1"
+
+# Copying a primed hasher skips the per-call OpenSSL context setup and
+# algorithm lookup that dominates for 40-byte inputs.
+_SHA1_PROTO = hashlib.sha1()
+
+
+def _uid(s: str) -> str:
+    data = s.encode("utf-8")
+    if _uid_algo == "blake2b":
+        return hashlib.blake2b(data, digest_size=20).hexdigest()
+    if _uid_algo == "blake2b64":
+        return hashlib.blake2b(data, digest_size=8).hexdigest()
+    h = _SHA1_PROTO.copy()
+    h.update(data)
+    return h.hexdigest()
+
+
+def _fmt_iso(t) -> str:
+    # Fixed ASCII format; f-string beats strftime's locale machinery
+    return (f"{t.tm_year:04d}-{t.tm_mon:02d}-{t.tm_mday:02d}"
+            f"T{t.tm_hour:02d}:{t.tm_min:02d}:{t.tm_sec:02d}Z")
+
+
 def now_iso():
-    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+    return _fmt_iso(time.gmtime())
+
+
+# One timestamp per run for entries with no usable date — the script is
+# a single shot, so "now" doesn't need re-deriving per entry.
+_RUN_ISO = now_iso()
 
 
+# Query params that identify a campaign, not a page
+_TRACKING_PARAMS = ("fbclid", "gclid")
+
+
+@lru_cache(maxsize=4096)
+def canon_link(url: str) -> str:
+    """
+    Canonical form of a link for dedup: lowercase scheme/host, no
+    fragment, no trailing slash, tracking params (utm_*, fbclid,
+    gclid) stripped. The item keeps its original link; this is only
+    the identity key.
+    """
+    if not url:
+        return ""
+    try:
+        parts = urlsplit(url)
+        q = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+             if not k.startswith("utm_") and k not in _TRACKING_PARAMS]
+        return urlunsplit((parts.scheme.lower(), parts.netloc.lower(),
+                           parts.path.rstrip("/"), urlencode(q), ""))
+    except Exception:
+        return url
+
+
+@lru_cache(maxsize=4096)
 def to_domain(url: str) -> str:
     try:
         host = urlparse(url).netloc.lower()
@@ -153,18 +329,10 @@ def _iso_from_entry(entry):
         t = entry.get(k)
         if t:
             try:
-                return time.strftime("%Y-%m-%dT%H:%M:%SZ", t)
+                return _fmt_iso(t)
             except Exception:
                 pass
-    return now_iso()
-
-
-def _age_days(iso_ts: str) -> float:
-    try:
-        t_struct = time.strptime(iso_ts, "%Y-%m-%dT%H:%M:%SZ")
-        return (time.mktime(time.gmtime()) - time.mktime(t_struct)) / 86400.0
-    except Exception:
-        return 0.0
+    return _RUN_ISO
 
 
 def extract_first_image(entry):
@@ -191,162 +359,327 @@ def collect_tags(entry):
     return tags
 
 
-def matches_any(text: str, needles):
-    if not needles:
+def matches_any(text_cf: str, needles_cf, automaton=None, pattern=None):
+    """Both haystack and needles must already be casefolded."""
+    if not needles_cf:
         return False
-    t = (text or "").casefold()
-    for n in needles:
-        if not n:
-            continue
-        if str(n).casefold() in t:
-            return True
-    return False
+    if automaton is not None:
+        return next(automaton.iter(text_cf), None) is not None
+    if pattern is not None:
+        return pattern.search(text_cf) is not None
+    return any(n in text_cf for n in needles_cf)
 
 
 def allowed_by_lists(item, rules):
-    # Keywords
-    text = f"{item['title']} {item['summary']}"
-    if rules["include_keywords"] and not matches_any(text, rules["include_keywords"]):
-        return False
-    if matches_any(text, rules["blocklist_keywords"]):
+    # Checks run cheapest/most-selective first so rejected items bail
+    # before any substring scan.
+    (min_len, cutoff_iso,
+     inc_src, exc_src, inc_auth, exc_auth, inc_tags, exc_tags,
+     inc_kw, inc_ac, inc_re, blk_kw, blk_ac, blk_re) = rules["_hot"]
+
+    # Title length
+    if len(item["title"]) < min_len:
         return False
 
-    # Age
-    if _age_days(item["isoDate"]) > float(rules["max_age_days"]):
+    # Age: isoDate strings sort lexicographically, so a plain compare
+    # against the precomputed cutoff replaces strptime per item
+    if item["isoDate"] < cutoff_iso:
         return False
 
     # Source allow/deny (by title or domain)
-    dom = to_domain(item["link"])
-    src_hit = (item["source"] or dom or "").casefold()
-    if rules["include_sources"]:
-        if not any(str(s).casefold() in (src_hit, dom) for s in rules["include_sources"]):
+    dom = item["_dom_cf"]
+    src_hit = item["_src_cf"] or dom or ""
+    if inc_src:
+        if not any(s in (src_hit, dom) for s in inc_src):
             return False
-    for s in rules["exclude_sources"]:
-        s = str(s).casefold()
-        if s and (s in src_hit or s == dom):
+    for s in exc_src:
+        if s in src_hit or s == dom:
             return False
 
     # Author allow/deny
-    auth = (item.get("author") or "").casefold()
-    if rules["include_authors"] and not any(a and str(a).casefold() in auth for a in rules["include_authors"]):
+    auth = item["_author_cf"]
+    if inc_auth and not any(a in auth for a in inc_auth):
         return False
-    if any(a and str(a).casefold() in auth for a in rules["exclude_authors"]):
+    if any(a in auth for a in exc_auth):
         return False
 
     # Tags allow/deny
-    tags = [str(t).casefold() for t in (item.get("tags") or [])]
-    if rules["include_tags"] and not any(str(x).casefold() in tags for x in rules["include_tags"]):
+    tags = item["_tags_cf"]
+    if inc_tags and not any(x in tags for x in inc_tags):
         return False
-    if any(str(x).casefold() in tags for x in rules["exclude_tags"]):
+    if any(x in tags for x in exc_tags):
         return False
 
-    # Title length
-    if len(item["title"]) < int(rules["min_title_length"]):
+    # Keywords last — the expensive text scans (haystack casefolded
+    # once in norm_item)
+    text = item["_text_cf"]
+    if inc_kw and not matches_any(text, inc_kw, inc_ac, inc_re):
+        return False
+    if matches_any(text, blk_kw, blk_ac, blk_re):
         return False
 
     return True
 
 
 # ----------------- Fetch & normalise -----------------
-def fetch_entries(url: str):
+# Sentinel: feed answered 304, previous items are still good.
+NOT_MODIFIED = object()
+
+
+def load_http_cache():
     try:
-        r = requests.get(url, headers={"User-Agent": UA}, timeout=TIMEOUT)
-        r.raise_for_status()
-        return feedparser.parse(r.content)
-    except Exception as e:
-        print(f"[error] Fetch {url}: {e}")
-        return feedparser.parse(b"")
+        data = json.loads(CACHE.read_text(encoding="utf-8"))
+        return data if isinstance(data, dict) else {}
+    except Exception:
+        return {}
+
+
+def save_http_cache(cache):
+    tmp = CACHE.with_suffix(".json.tmp")
+    tmp.write_text(json.dumps(cache, indent=2, ensure_ascii=False))
+    os.replace(tmp, CACHE)
+
+
+def fetch_entries(url: str, cached=None):
+    """
+    GET a feed, sending If-None-Match / If-Modified-Since when we have
+    validators from a previous run. Returns (parsed, meta):
+      - parsed is the feedparser result, or NOT_MODIFIED on a 304;
+      - meta holds the ETag/Last-Modified to remember for next run.
+    Retries 5xx / network errors up to 3 times with exponential
+    backoff; other HTTP errors (404/410/...) fail fast.
+    """
+    headers = {"User-Agent": UA}
+    if cached:
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+
+    last_err = None
+    for attempt in range(3):
+        try:
+            r = SESSION.get(url, headers=headers, timeout=TIMEOUT, stream=True)
+            try:
+                if r.status_code == 304:
+                    return NOT_MODIFIED, dict(cached or {})
+                if 400 <= r.status_code < 500:
+                    # Permanently dead feed — retrying won't revive it
+                    err = requests.HTTPError(f"HTTP {r.status_code}")
+                    print(f"[error] Fetch {url}: {err}")
+                    return types.SimpleNamespace(entries=[], bozo=1, bozo_exception=err), {}
+                r.raise_for_status()  # 5xx → retry via except below
+                meta = {}
+                if r.headers.get("ETag"):
+                    meta["etag"] = r.headers["ETag"]
+                if r.headers.get("Last-Modified"):
+                    meta["last_modified"] = r.headers["Last-Modified"]
+                # Hand the (transparently decompressed) stream straight to
+                # feedparser — no full-body bytes object per feed
+                r.raw.decode_content = True
+                return feedparser.parse(r.raw), meta
+            finally:
+                r.close()
+        except Exception as e:
+            last_err = e
+            if attempt < 2:
+                time.sleep(2 ** attempt)
+
+    print(f"[error] Fetch {url}: {last_err}")
+    # Shape-compatible stub; no point running feedparser on nothing
+    return types.SimpleNamespace(entries=[], bozo=1, bozo_exception=last_err), {}
 
 
 def norm_item(entry, feed_title, category):
-    ts   = _iso_from_entry(entry)
-    link = (entry.get("link") or "").strip()
-    raw_uid = link if link else f"{entry.get('title','')}{ts}"
-    uid  = hashlib.sha1(raw_uid.encode("utf-8")).hexdigest()
+    ts      = _iso_from_entry(entry)
+    title   = (entry.get("title") or "").strip()
+    link    = (entry.get("link") or "").strip()
+    summary = (entry.get("summary") or "").strip()
+    author  = (entry.get("author") or "").strip()
+    tags    = collect_tags(entry)
+    raw_uid = link if link else f"{title}{ts}"
+    uid  = _uid(raw_uid)
     return {
         "id": uid,
-        "title": (entry.get("title") or "").strip(),
+        "title": title,
         "link": link,
-        "summary": (entry.get("summary") or "").strip(),
+        "summary": summary,
         "isoDate": ts,
-        "source": feed_title or "",
-        "category": category or "",
-        "author": (entry.get("author") or "").strip(),
-        "tags": collect_tags(entry),
+        # intern: these repeat for every item of a feed, share the objects
+        "source": intern(feed_title or ""),
+        "category": intern(category or ""),
+        "author": intern(author),
+        "tags": tags,
         "image": extract_first_image(entry) or "",
         "pinned": False,
+        # Casefolded scratch fields for allowed_by_lists; stripped
+        # before items.json is written.
+        "_text_cf": f"{title} {summary}".casefold(),
+        "_src_cf": intern((feed_title or "").casefold()),
+        "_dom_cf": to_domain(link),
+        "_author_cf": intern(author.casefold()),
+        "_tags_cf": [str(t).casefold() for t in tags],
     }
 
 
 # ----------------- Main -----------------
 def main():
+    global _uid_algo
     rules  = load_rules(RULES)
+    _uid_algo = str(rules.get("id_algo") or "sha1").lower()
+    if not rules["sanitize_html"]:
+        # Fast path for trusted feeds: feedparser's HTML sanitiser is
+        # the bulk of its per-entry CPU. Leave on unless every source
+        # is trusted — summaries end up rendered in the page.
+        feedparser.SANITIZE_HTML = 0
+        feedparser.RESOLVE_RELATIVE_URIS = 0
     feeds  = parse_opml(OPML)
     print(f"[info] OPML: {len(feeds)} feeds from {OPML}")
 
+    # Conditional-GET state and last run's output (reused on 304s).
+    cache = load_http_cache()
+    try:
+        prev_items = json.loads(OUT.read_text(encoding="utf-8"))
+    except Exception:
+        prev_items = []
+    prev_by_source = {}
+    prev_by_link = {}
+    for it in prev_items:
+        if not it.get("pinned"):
+            prev_by_source.setdefault(it.get("source") or "", []).append(it)
+            k = canon_link(it.get("link") or "")
+            if k:
+                prev_by_link[k] = it
+
     items = []
     per_source_count = {}
 
-    for f in feeds:
-        url, title, category = f["url"], (f["title"] or ""), (f.get("category") or "")
-        d = fetch_entries(url)
-        raw = len(d.entries or [])
-        kept = 0
+    # Fetch in parallel (IO-bound); normalisation/filtering stays in this
+    # thread inside the as_completed loop, so no locks on items/counters.
+    tasks = [(f["url"], f["title"] or "", f.get("category") or "") for f in feeds]
+    # Clamp to 1..MAX_WORKERS: the shared adapter pool is sized for
+    # MAX_WORKERS, and a bad config value must not crash the run
+    workers = max(1, min(rules["fetch_workers"], MAX_WORKERS, len(feeds)))
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        futures = {ex.submit(fetch_entries, url, cache.get(url)): (url, title, cat)
+                   for url, title, cat in tasks}
+        for fut in as_completed(futures):
+            url, title, category = futures[fut]
+            d, meta = fut.result()
+            if d is NOT_MODIFIED and not prev_by_source.get(title):
+                # 304 but nothing to reuse (fresh checkout, renamed
+                # source, lost items.json) — refetch without validators
+                d, meta = fetch_entries(url)
+            if meta:
+                cache[url] = meta
+            else:
+                cache.pop(url, None)
+
+            # per-source cap (match by title or domain, case-insensitive)
+            cap_key = title or to_domain(url)
+            cap = rules["_caps_cf"].get(cap_key.casefold(), 10**9)
+            per_source_count.setdefault(cap_key, 0)
+
+            if d is NOT_MODIFIED:
+                reused = 0
+                for it in prev_by_source.get(title, []):
+                    if per_source_count[cap_key] >= cap:
+                        break
+                    # Same cheap screen as the seen-item path: quiet
+                    # feeds 304 forever, their items must still expire
+                    if (len(it["title"]) < rules["min_title_length"]
+                            or it["isoDate"] < rules["_cutoff_iso"]):
+                        continue
+                    items.append(it)
+                    per_source_count[cap_key] += 1
+                    reused += 1
+                print(f"[info] {title or url}: not modified, reused={reused}")
+                continue
 
-        # per-source cap (match by title or domain)
-        cap_key = title or to_domain(url)
-        caps_map = rules.get("max_per_source") or {}
-        try:
-            cap = int(caps_map.get(cap_key, 10**9))
-        except Exception:
-            cap = 10**9
-        per_source_count.setdefault(cap_key, 0)
+            raw = len(d.entries or [])
+            kept = 0
+
+            if getattr(d, "bozo", 0):
+                print(f"[warn] Parse issue on {title or url}: {getattr(d, 'bozo_exception', '')}")
+
+            entries = list(d.entries or [])
+            if per_source_count[cap_key] + len(entries) > cap:
+                # Cap will bind: take entries newest-first and stop at the
+                # cap instead of normalising items only to throw them away
+                entries.sort(key=lambda e: e.get("published_parsed") or (), reverse=True)
+            for e in entries:
+                if per_source_count[cap_key] >= cap:
+                    break
+                # Entries already in last run's output skip the whole
+                # normalise+filter pass; they only re-take the cheap
+                # title/age checks so rule edits still expire them
+                known = prev_by_link.get(canon_link((e.get("link") or "").strip()))
+                if known is not None:
+                    if (len(known["title"]) >= rules["min_title_length"]
+                            and known["isoDate"] >= rules["_cutoff_iso"]):
+                        items.append(known)
+                        per_source_count[cap_key] += 1
+                        kept += 1
+                    continue
+                it = norm_item(e, title, category)
+                if not allowed_by_lists(it, rules):
+                    continue
+                items.append(it)
+                per_source_count[cap_key] += 1
+                kept += 1
+
+            print(f"[info] {title or url}: raw={raw} kept={kept} cap={cap} sofar={per_source_count[cap_key]}")
 
-        if getattr(d, "bozo", 0):
-            print(f"[warn] Parse issue on {title or url}: {getattr(d, 'bozo_exception', '')}")
+    try:
+        max_items = int(rules.get("max_items", 500))
+    except Exception:
+        max_items = 500
 
-        for e in d.entries or []:
-            it = norm_item(e, title, category)
-            if not allowed_by_lists(it, rules):
-                continue
-            if per_source_count[cap_key] >= cap:
-                continue
-            items.append(it)
-            per_source_count[cap_key] += 1
-            kept += 1
-
-        print(f"[info] {title or url}: raw={raw} kept={kept} cap={cap} sofar={per_source_count[cap_key]}")
-
-    # De-dup newest first; prefer link, fallback to id
-    seen, dedup = set(), []
-    for it in sorted(items, key=lambda x: x["isoDate"], reverse=True):
-        key = it["link"] or it["id"]
-        if key in seen:
-            continue
-        seen.add(key)
-        dedup.append(it)
-
-    # Pin items
+    # De-dup: keep the newest item per link (fallback id) in one dict
+    # pass, then pull only the top max_items by date — O(N log K)
+    # instead of fully sorting every collected item.
+    by_key = {}
+    for it in items:
+        key = canon_link(it["link"]) or it["id"]
+        prev = by_key.get(key)
+        if prev is None or it["isoDate"] > prev["isoDate"]:
+            by_key[key] = it
+    dedup = heapq.nlargest(max_items, by_key.values(), key=itemgetter("isoDate"))
+
+    # Pin items (built separately, prepended once — no O(N) inserts)
+    pinned = []
+    pin_ts = now_iso()
     for p in (rules.get("pin") or []):
         link = p.get("url", "")
         title = p.get("title", "")
         note = p.get("note", "")
-        uid = hashlib.sha1((link or title).encode("utf-8")).hexdigest()
-        dedup.insert(0, {
+        uid = _uid(link or title)
+        pinned.append({
             "id": uid, "title": title, "link": link, "summary": note,
-            "isoDate": now_iso(), "source": "Pinned", "category": "", "author": "",
+            "isoDate": pin_ts, "source": "Pinned", "category": "", "author": "",
             "tags": [], "image": "", "pinned": True,
         })
 
-    # Cap history
-    try:
-        max_items = int(rules.get("max_items", 500))
-    except Exception:
-        max_items = 500
-    dedup = dedup[:max_items]
-
-    OUT.write_text(json.dumps(dedup, indent=2, ensure_ascii=False))
-    print(f"[ok] Wrote {len(dedup)} items -> {OUT}")
+    # Pins live inside the max_items cap: trim feed items to make room
+    # up front rather than serialising entries that get cut afterwards
+    keep = max(0, max_items - len(pinned))
+    dedup = pinned[:max_items] + dedup[:keep]
+
+    # Drop the _* scratch fields before serialising
+    public = [{k: v for k, v in it.items() if not k.startswith("_")} for it in dedup]
+
+    # Compact output: nothing human reads items.json, the frontend just
+    # fetches it, so indentation only doubles bytes and encode time.
+    # Written to a sibling tmp file and swapped in so an interrupted run
+    # never leaves a truncated items.json behind.
+    tmp = OUT.with_suffix(".json.tmp")
+    if orjson is not None:
+        tmp.write_bytes(orjson.dumps(public, option=orjson.OPT_APPEND_NEWLINE))
+    else:
+        tmp.write_text(json.dumps(public, ensure_ascii=False))
+    os.replace(tmp, OUT)
+    save_http_cache(cache)
+    print(f"[ok] Wrote {len(public)} items -> {OUT}")
 
 
 if __name__ == "__main__":